@@ -1,11 +1,15 @@
 import os
 import re
+import logging
+import threading
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from slack_bolt import App as SlackApp
 from slack_bolt.adapter.fastapi import SlackRequestHandler
 from dotenv import load_dotenv
 from openai import OpenAI
 from collections import defaultdict
+from tableau_permissions import TableauClient, PermissionIndex, SlackUserDirectory, load_tableau_permissions, filter_by_permission
 
 # === Ortam değişkenlerini yükle ===
 load_dotenv()
@@ -604,10 +608,39 @@ TABLEAU_REPORTS = {
 }
 }
 
+# === Tableau yetkileri ===
+# Açıksa eşleşen raporlar, kullanıcının Tableau'da görebildikleriyle sınırlanır.
+# Yetki haritası REST API'den toplu yüklenir ve bellekte tutulur; mesaj başına
+# Tableau'ya istek atılmaz.
+TABLEAU_PERMISSION_FILTER = os.getenv("TABLEAU_PERMISSION_FILTER", "").lower() in ("1", "true", "yes")
+TABLEAU_SERVER_URL = os.getenv("TABLEAU_SERVER_URL", "https://prod-useast-b.online.tableau.com").rstrip("/")
+TABLEAU_SITE = os.getenv("TABLEAU_SITE", "emigros")
+TABLEAU_API_VERSION = os.getenv("TABLEAU_API_VERSION", "3.22")
+TABLEAU_PAT_NAME = os.getenv("TABLEAU_PAT_NAME")
+TABLEAU_PAT_SECRET = os.getenv("TABLEAU_PAT_SECRET")
+TABLEAU_PERMISSION_TTL = int(os.getenv("TABLEAU_PERMISSION_TTL", "900"))
+
+tableau_client = TableauClient(TABLEAU_SERVER_URL, TABLEAU_SITE, TABLEAU_API_VERSION, TABLEAU_PAT_NAME, TABLEAU_PAT_SECRET)
+permission_index = PermissionIndex(lambda: load_tableau_permissions(tableau_client, TABLEAU_REPORTS), TABLEAU_PERMISSION_TTL)
+
 # === Slack + FastAPI ===
 bolt_app = SlackApp(token=SLACK_BOT_TOKEN, signing_secret=SLACK_SIGNING_SECRET)
-api = FastAPI()
 handler = SlackRequestHandler(bolt_app)
+slack_users = SlackUserDirectory(bolt_app.client, TABLEAU_PERMISSION_TTL)
+
+def _warm_permission_index():
+    try:
+        permission_index.load()
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"Tableau yetkileri yüklenemedi: {e}")
+
+@asynccontextmanager
+async def lifespan(app):
+    if TABLEAU_PERMISSION_FILTER:
+        threading.Thread(target=_warm_permission_index, daemon=True).start()
+    yield
+
+api = FastAPI(lifespan=lifespan)
 
 def keyword_score(message, keywords):
     msg = message.lower()
@@ -647,6 +680,11 @@ def handle_message_events(body, say, logger):
         matches = find_matching_reports(text)
 
         if matches:
+            if TABLEAU_PERMISSION_FILTER:
+                matches = filter_by_permission(matches, permission_index, slack_users, user, logger)
+                if not matches:
+                    say(f"<@{user}> İlgili raporlar var ama Tableau'da erişim yetkin görünmüyor. Erişim için rapor sahibine başvurabilirsin 🔒")
+                    return
             say(f"<@{user}> 📊 İlgili raporlar aşağıda:")
             for name, rapor in matches:
                 say(f"• **{name.title()}** → {rapor['desc']}\n🔗 {rapor['link']}")
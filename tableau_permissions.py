@@ -0,0 +1,273 @@
+# === Tableau yetki haritası ===
+# Tableau REST API'den kullanıcı, grup ve workbook/view izinleri toplu yüklenir;
+# sonuç kullanıcı adı -> görülebilen rapor adları haritası olarak bellekte tutulur.
+import logging
+import re
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+ADMIN_ROLES = {"ServerAdministrator", "SiteAdministratorCreator", "SiteAdministratorExplorer", "SiteAdministrator"}
+PAGE_SIZE = 1000
+RETRY_SECONDS = 60
+
+
+def report_view_path(link):
+    """Rapor linkinden (workbook, view) contentUrl ikilisini çıkarır."""
+    m = re.search(r"/views/([^/?#]+)/([^/?#]+)", link)
+    return (m.group(1), m.group(2)) if m else None
+
+
+class TableauClient:
+    def __init__(self, server_url, site, api_version, pat_name, pat_secret, timeout=10, page_size=PAGE_SIZE):
+        self.base = f"{server_url}/api/{api_version}"
+        self.site = site
+        self.pat_name = pat_name
+        self.pat_secret = pat_secret
+        self.timeout = timeout
+        self.page_size = page_size
+        self.session = requests.Session()
+        self.session.headers["Accept"] = "application/json"
+        self.site_id = None
+
+    def sign_in(self):
+        resp = self.session.post(f"{self.base}/auth/signin", timeout=self.timeout, json={
+            "credentials": {
+                "personalAccessTokenName": self.pat_name,
+                "personalAccessTokenSecret": self.pat_secret,
+                "site": {"contentUrl": self.site},
+            }
+        })
+        resp.raise_for_status()
+        creds = resp.json()["credentials"]
+        self.session.headers["X-Tableau-Auth"] = creds["token"]
+        self.site_id = creds["site"]["id"]
+
+    def sign_out(self):
+        try:
+            self.session.post(f"{self.base}/auth/signout", timeout=self.timeout)
+        except requests.RequestException:
+            pass
+        self.session.headers.pop("X-Tableau-Auth", None)
+
+    def get(self, path):
+        resp = self.session.get(f"{self.base}/sites/{self.site_id}/{path}", timeout=self.timeout)
+        resp.raise_for_status()
+        return resp.json()
+
+    def paged(self, path, collection, item):
+        page = 1
+        while True:
+            sep = "&" if "?" in path else "?"
+            data = self.get(f"{path}{sep}pageSize={self.page_size}&pageNumber={page}")
+            items = (data.get(collection) or {}).get(item) or []
+            yield from items
+            total = int((data.get("pagination") or {}).get("totalAvailable", 0))
+            if not items or page * self.page_size >= total:
+                return
+            page += 1
+
+
+def _read_rules(permissions):
+    """granteeCapabilities içinden Read kurallarını (kullanıcı, grup) olarak ayırır."""
+    users, groups = {}, {}
+    for grant in (permissions.get("permissions") or {}).get("granteeCapabilities") or []:
+        caps = (grant.get("capabilities") or {}).get("capability") or []
+        mode = next((c.get("mode") for c in caps if c.get("name") == "Read"), None)
+        if mode is None:
+            continue
+        if "user" in grant:
+            users[grant["user"]["id"]] = mode
+        elif "group" in grant:
+            groups[grant["group"]["id"]] = mode
+    return users, groups
+
+
+def _can_read(user_id, user_groups, rules):
+    # Tableau önceliği: kullanıcı kuralı > grup Deny > grup Allow
+    users, groups = rules
+    if user_id in users:
+        return users[user_id] == "Allow"
+    modes = {groups[g] for g in user_groups if g in groups}
+    return "Deny" not in modes and "Allow" in modes
+
+
+def load_tableau_permissions(tableau, reports):
+    """Kullanıcı adı (küçük harf) -> erişebildiği rapor adları haritasını döner.
+
+    Linki çözülemeyen ya da workbook/view'i Tableau'da bulunamayan raporlar
+    yetki hatası değil yapılandırma hatasıdır: uyarı loglanır ve bu raporlar
+    lisanslı herkese açık sayılır.
+    """
+    targets = {}
+    unresolved = set()
+    for name, info in reports.items():
+        path = report_view_path(info["link"])
+        if path:
+            targets.setdefault(path[0], []).append((name, path[1]))
+        else:
+            logger.warning(f"Rapor linki çözülemedi: {name} ({info['link']})")
+            unresolved.add(name)
+
+    tableau.sign_in()
+    try:
+        users = list(tableau.paged("users", "users", "user"))
+        user_groups = defaultdict(set)
+        for group in tableau.paged("groups", "groups", "group"):
+            for member in tableau.paged(f"groups/{group['id']}/users", "users", "user"):
+                user_groups[member["id"]].add(group["id"])
+
+        # (rapor adı, sahip id, geçerli kurallar)
+        report_rules = []
+        found = set()
+        for wb in tableau.paged("workbooks", "workbooks", "workbook"):
+            wanted = targets.get(wb.get("contentUrl"))
+            if not wanted:
+                continue
+            found.add(wb["contentUrl"])
+            wb_rules = _read_rules(tableau.get(f"workbooks/{wb['id']}/permissions"))
+            views = {
+                v.get("contentUrl", "").rsplit("/", 1)[-1]: v["id"]
+                for v in tableau.paged(f"workbooks/{wb['id']}/views", "views", "view")
+            }
+            owner_id = (wb.get("owner") or {}).get("id")
+            for name, view_url in wanted:
+                if view_url not in views:
+                    logger.warning(f"View bulunamadı: {name} ({wb['contentUrl']}/{view_url})")
+                    unresolved.add(name)
+                    continue
+                rules = wb_rules
+                view_rules = _read_rules(tableau.get(f"views/{views[view_url]}/permissions"))
+                if view_rules[0] or view_rules[1]:
+                    rules = view_rules
+                report_rules.append((name, owner_id, rules))
+    finally:
+        tableau.sign_out()
+
+    for workbook, wanted in targets.items():
+        if workbook not in found:
+            names = [name for name, _ in wanted]
+            logger.warning(f"Workbook bulunamadı: {workbook} ({', '.join(names)})")
+            unresolved.update(names)
+
+    everything = frozenset(reports)
+    unresolved = frozenset(unresolved)
+    permissions = {}
+    for user in users:
+        uid = user["id"]
+        role = user.get("siteRole", "")
+        if role in ADMIN_ROLES:
+            allowed = everything
+        elif role == "Unlicensed":
+            allowed = frozenset()
+        else:
+            allowed = unresolved | frozenset(
+                name for name, owner_id, rules in report_rules
+                if uid == owner_id or _can_read(uid, user_groups[uid], rules)
+            )
+        permissions[user["name"].lower()] = allowed
+        if user.get("email"):
+            permissions.setdefault(user["email"].lower(), allowed)
+    return permissions
+
+
+class PermissionIndex:
+    """TTL ile yenilenen, aynı anda tek yükleme yapan bellek içi yetki haritası.
+
+    `snapshot` hiçbir zaman beklemez: süresi dolmuşsa yenilemeyi arka planda
+    başlatır ve elindeki haritayı (ilk yüklemeden önce None) döner. Yüklemeyi
+    bekleyen tek yol `load`'dur (açılıştaki ısınma için).
+    """
+
+    def __init__(self, loader, ttl):
+        self._loader = loader
+        self._ttl = ttl
+        self._snapshot = None
+        self._expires_at = 0.0
+        self._reload_lock = threading.Lock()
+
+    def _reload(self):
+        try:
+            self._snapshot = self._loader()
+            self._expires_at = time.monotonic() + self._ttl
+        except Exception:
+            self._expires_at = time.monotonic() + min(self._ttl, RETRY_SECONDS)
+            raise
+
+    def _reload_in_background(self):
+        try:
+            self._reload()
+        except Exception as e:
+            logger.warning(f"Tableau yetkileri yenilenemedi: {e}")
+        finally:
+            self._reload_lock.release()
+
+    def load(self):
+        with self._reload_lock:
+            if time.monotonic() >= self._expires_at:
+                self._reload()
+        return self._snapshot
+
+    def snapshot(self):
+        if time.monotonic() >= self._expires_at and self._reload_lock.acquire(blocking=False):
+            threading.Thread(target=self._reload_in_background, daemon=True).start()
+        return self._snapshot
+
+    def allowed_reports(self, tableau_user):
+        """Kullanıcının raporları; harita yoksa ya da kullanıcı bilinmiyorsa None."""
+        snapshot = self.snapshot()
+        if snapshot is None:
+            return None
+        return snapshot.get(tableau_user.lower())
+
+
+class SlackUserDirectory:
+    """Slack kullanıcısı -> Tableau kullanıcı adı (e-posta) önbelleği.
+
+    Önbellek TTL dolunca tamamen boşaltılır; böylece büyümesi sınırlı kalır ve
+    değişen e-postalar yetki haritasıyla aynı sürede görülür.
+    """
+
+    def __init__(self, slack_client, ttl):
+        self._slack_client = slack_client
+        self._ttl = ttl
+        self._emails = {}
+        self._expires_at = 0.0
+
+    def tableau_user(self, slack_user):
+        now = time.monotonic()
+        if now >= self._expires_at:
+            self._emails = {}
+            self._expires_at = now + self._ttl
+        if slack_user not in self._emails:
+            info = self._slack_client.users_info(user=slack_user)
+            email = (info["user"].get("profile") or {}).get("email")
+            if not email:
+                return None
+            self._emails[slack_user] = email
+        return self._emails[slack_user]
+
+
+def filter_by_permission(matches, index, directory, slack_user, logger):
+    """Eşleşmeleri kullanıcının görebildikleriyle sınırlar.
+
+    Kullanıcı ya da harita bilinmiyorsa hepsi gösterilir; boş liste yalnızca
+    bilinen bir Tableau kullanıcısının hiçbirini okuyamadığı anlamına gelir.
+    """
+    try:
+        tableau_user = directory.tableau_user(slack_user)
+    except Exception as e:
+        logger.warning(f"Yetki kontrolü yapılamadı, tüm raporlar gösteriliyor: {e}")
+        return matches
+    if not tableau_user:
+        logger.warning(f"{slack_user} için e-posta bulunamadı (users:read.email?), tüm raporlar gösteriliyor")
+        return matches
+    allowed = index.allowed_reports(tableau_user)
+    if allowed is None:
+        logger.warning(f"{tableau_user} için Tableau yetkisi bilinmiyor, tüm raporlar gösteriliyor")
+        return matches
+    return [(name, info) for name, info in matches if name in allowed]
@@ -0,0 +1,325 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tableau_permissions import (  # noqa: E402
+    PermissionIndex,
+    SlackUserDirectory,
+    TableauClient,
+    filter_by_permission,
+    load_tableau_permissions,
+)
+
+API = "/api/3.22"
+SITE_ID = "site-1"
+TOKEN = "token-1"
+
+
+def _grant(kind, grantee_id, mode):
+    return {kind: {"id": grantee_id}, "capabilities": {"capability": [{"name": "Read", "mode": mode}]}}
+
+
+def _permissions(*grants):
+    return {"permissions": {"granteeCapabilities": list(grants)}}
+
+
+USERS = [
+    {"id": "u-dave", "name": "Dave@x.com", "siteRole": "Viewer"},
+    {"id": "u-alice", "name": "alice@x.com", "siteRole": "Viewer"},
+    {"id": "u-carol", "name": "carol@x.com", "siteRole": "Viewer"},
+    {"id": "u-bob", "name": "bob@x.com", "siteRole": "Viewer"},
+    {"id": "u-erin", "name": "erin@x.com", "siteRole": "Explorer"},
+    {"id": "u-owner", "name": "owner@x.com", "siteRole": "Creator"},
+    {"id": "u-admin", "name": "admin@x.com", "siteRole": "SiteAdministratorCreator"},
+    {"id": "u-unlicensed", "name": "unlicensed@x.com", "siteRole": "Unlicensed"},
+]
+
+# Sayfalı listeler: yol -> (koleksiyon, öğe, kayıtlar)
+LISTS = {
+    "users": ("users", "user", USERS),
+    "groups": ("groups", "group", [{"id": "g-sales"}, {"id": "g-ops"}]),
+    "groups/g-sales/users": ("users", "user", [
+        {"id": "u-dave"}, {"id": "u-alice"}, {"id": "u-bob"}, {"id": "u-unlicensed"},
+    ]),
+    "groups/g-ops/users": ("users", "user", [{"id": "u-bob"}, {"id": "u-carol"}, {"id": "u-erin"}]),
+    "workbooks": ("workbooks", "workbook", [
+        {"id": "wb-hemen", "contentUrl": "HemenLFL", "owner": {"id": "u-owner"}},
+        {"id": "wb-lfl", "contentUrl": "LFL", "owner": {"id": "u-admin"}},
+        {"id": "wb-other", "contentUrl": "Other", "owner": {"id": "u-admin"}},
+    ]),
+    "workbooks/wb-hemen/views": ("views", "view", [{"id": "v-hemen", "contentUrl": "HemenLFL/sheets/HemenAnaliz"}]),
+    "workbooks/wb-lfl/views": ("views", "view", [
+        {"id": "v-sanal", "contentUrl": "LFL/sheets/SanalMarketLFL_1"},
+        {"id": "v-macro", "contentUrl": "LFL/sheets/MacrocenterLFL"},
+    ]),
+}
+
+DOCS = {
+    "workbooks/wb-hemen/permissions": _permissions(
+        _grant("group", "g-sales", "Allow"),
+        _grant("group", "g-ops", "Deny"),
+        _grant("user", "u-alice", "Deny"),
+        _grant("user", "u-carol", "Allow"),
+    ),
+    "views/v-hemen/permissions": _permissions(),
+    "workbooks/wb-lfl/permissions": _permissions(_grant("group", "g-sales", "Allow")),
+    "views/v-sanal/permissions": _permissions(_grant("group", "g-ops", "Allow")),
+    "views/v-macro/permissions": _permissions(),
+}
+
+REPORTS = {
+    "hemen analiz raporu": {"link": "https://x/#/site/s/views/HemenLFL/HemenAnaliz"},
+    "sanal market analizi lfl": {"link": "https://x/#/site/s/views/LFL/SanalMarketLFL_1"},
+    "macrocenter analizi lfl": {"link": "https://x/#/site/s/views/LFL/MacrocenterLFL"},
+    "eksik rapor": {"link": "https://x/#/site/s/views/Missing/Dashboard1"},
+    "eski view": {"link": "https://x/#/site/s/views/LFL/EskiView"},
+    "bozuk link": {"link": "https://x/#/site/s/workbooks/123"},
+}
+# Workbook/view'i bulunamayan ya da linki çözülemeyen raporlar
+UNRESOLVED = {"eksik rapor", "eski view", "bozuk link"}
+
+
+class MockTableau(BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path == f"{API}/auth/signin":
+            self.rfile.read(int(self.headers["Content-Length"]))
+            return self._send(200, {"credentials": {"token": TOKEN, "site": {"id": SITE_ID}}})
+        if self.path == f"{API}/auth/signout":
+            return self._send(204, {})
+        self._send(404, {})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self.requests_seen.append(self.path)
+        prefix = f"{API}/sites/{SITE_ID}/"
+        if self.headers.get("X-Tableau-Auth") != TOKEN or not url.path.startswith(prefix):
+            return self._send(401, {})
+        path = url.path[len(prefix):]
+        if path in DOCS:
+            return self._send(200, DOCS[path])
+        if path not in LISTS:
+            return self._send(404, {})
+        collection, item, records = LISTS[path]
+        query = parse_qs(url.query)
+        size = int(query["pageSize"][0])
+        number = int(query["pageNumber"][0])
+        page = records[(number - 1) * size:number * size]
+        self._send(200, {
+            "pagination": {"pageNumber": str(number), "pageSize": str(size), "totalAvailable": str(len(records))},
+            collection: {item: page},
+        })
+
+
+class _Capture(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+@pytest.fixture(scope="module")
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockTableau)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+@pytest.fixture(scope="module")
+def load_result(server_url):
+    MockTableau.requests_seen.clear()
+    client = TableauClient(server_url, "s", "3.22", "pat", "secret", page_size=2)
+    handler = _Capture()
+    logger = logging.getLogger("tableau_permissions")
+    logger.addHandler(handler)
+    try:
+        return load_tableau_permissions(client, REPORTS), handler.messages
+    finally:
+        logger.removeHandler(handler)
+
+
+@pytest.fixture(scope="module")
+def permissions(load_result):
+    return load_result[0]
+
+
+def test_user_rule_beats_group_rule(permissions):
+    assert "hemen analiz raporu" not in permissions["alice@x.com"]
+    assert "hemen analiz raporu" in permissions["carol@x.com"]
+
+
+def test_group_deny_beats_group_allow(permissions):
+    assert "hemen analiz raporu" in permissions["dave@x.com"]
+    assert "hemen analiz raporu" not in permissions["bob@x.com"]
+
+
+def test_view_rules_override_workbook_rules(permissions):
+    assert permissions["dave@x.com"] == {"hemen analiz raporu", "macrocenter analizi lfl"} | UNRESOLVED
+    assert permissions["erin@x.com"] == {"sanal market analizi lfl"} | UNRESOLVED
+
+
+def test_unresolved_reports_are_logged_and_not_hidden(load_result):
+    permissions, warnings = load_result
+    for user in ("alice@x.com", "bob@x.com", "carol@x.com", "owner@x.com"):
+        assert UNRESOLVED <= permissions[user]
+    assert any("Missing" in w and "eksik rapor" in w for w in warnings)
+    assert any("LFL/EskiView" in w for w in warnings)
+    assert any("bozuk link" in w for w in warnings)
+    assert len(warnings) == 3
+
+
+def test_owner_and_admin(permissions):
+    assert permissions["owner@x.com"] == {"hemen analiz raporu"} | UNRESOLVED
+    assert permissions["admin@x.com"] == set(REPORTS)
+
+
+def test_unlicensed_sees_nothing(permissions):
+    assert permissions["unlicensed@x.com"] == frozenset()
+
+
+def test_pagination(permissions):
+    assert set(permissions) == {u["name"].lower() for u in USERS}
+    user_pages = [p for p in MockTableau.requests_seen if urlparse(p).path.endswith("/users")
+                  and "/groups/" not in p]
+    assert len(user_pages) == 4
+
+
+class SlowLoader:
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+        self.entered = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.entered.set()
+        self.release.wait(5)
+        return {"a@x.com": frozenset({f"rapor-{self.calls}"})}
+
+
+def test_snapshot_does_not_wait_for_first_load():
+    loader = SlowLoader()
+    index = PermissionIndex(loader, ttl=60)
+    started = time.monotonic()
+    assert index.allowed_reports("a@x.com") is None
+    assert time.monotonic() - started < 1
+    loader.release.set()
+    assert index.load() == {"a@x.com": frozenset({"rapor-1"})}
+    assert loader.calls == 1
+
+
+def test_single_reload_serves_stale_map():
+    loader = SlowLoader()
+    loader.release.set()
+    index = PermissionIndex(loader, ttl=0.05)
+    index.load()
+    loader.release.clear()
+    loader.entered.clear()
+    time.sleep(0.1)
+
+    threads = [threading.Thread(target=index.snapshot) for _ in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert loader.entered.wait(5)
+    assert index.allowed_reports("a@x.com") == {"rapor-1"}
+    assert loader.calls == 2
+
+    loader.release.set()
+    deadline = time.monotonic() + 5
+    while index.allowed_reports("a@x.com") == {"rapor-1"} and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert index.allowed_reports("a@x.com") != {"rapor-1"}
+    assert index.allowed_reports("nobody@x.com") is None
+
+
+class FakeSlackClient:
+    def __init__(self, emails):
+        self.emails = emails
+        self.calls = 0
+
+    def users_info(self, user):
+        self.calls += 1
+        return {"user": {"profile": {"email": self.emails.get(user)}}}
+
+
+MATCHES = [("hemen analiz raporu", {}), ("sanal market analizi lfl", {})]
+LOGGER = logging.getLogger("test_tableau_permissions")
+
+
+def _loaded_index(snapshot):
+    index = PermissionIndex(lambda: snapshot, ttl=60)
+    index.load()
+    return index
+
+
+def test_filter_known_user_without_read_gets_nothing():
+    index = _loaded_index({"a@x.com": frozenset()})
+    directory = SlackUserDirectory(FakeSlackClient({"U1": "A@x.com"}), ttl=60)
+    assert filter_by_permission(MATCHES, index, directory, "U1", LOGGER) == []
+
+
+def test_filter_keeps_only_readable_reports():
+    index = _loaded_index({"a@x.com": frozenset({"sanal market analizi lfl"})})
+    directory = SlackUserDirectory(FakeSlackClient({"U1": "a@x.com"}), ttl=60)
+    assert filter_by_permission(MATCHES, index, directory, "U1", LOGGER) == [MATCHES[1]]
+
+
+def test_filter_fails_open_before_first_load():
+    loader = SlowLoader()
+    index = PermissionIndex(loader, ttl=60)
+    directory = SlackUserDirectory(FakeSlackClient({"U1": "a@x.com"}), ttl=60)
+    assert filter_by_permission(MATCHES, index, directory, "U1", LOGGER) == MATCHES
+    loader.release.set()
+
+
+def test_filter_fails_open_for_unknown_tableau_user():
+    index = _loaded_index({"a@x.com": frozenset()})
+    directory = SlackUserDirectory(FakeSlackClient({"U2": "stranger@x.com"}), ttl=60)
+    assert filter_by_permission(MATCHES, index, directory, "U2", LOGGER) == MATCHES
+
+
+def test_filter_fails_open_without_email_and_does_not_cache_it():
+    index = _loaded_index({"a@x.com": frozenset()})
+    slack = FakeSlackClient({})
+    directory = SlackUserDirectory(slack, ttl=60)
+    assert filter_by_permission(MATCHES, index, directory, "U1", LOGGER) == MATCHES
+    slack.emails["U1"] = "a@x.com"
+    assert filter_by_permission(MATCHES, index, directory, "U1", LOGGER) == []
+    assert slack.calls == 2
+
+
+def test_directory_refreshes_after_ttl():
+    slack = FakeSlackClient({"U1": "old@x.com"})
+    directory = SlackUserDirectory(slack, ttl=0.05)
+    assert directory.tableau_user("U1") == "old@x.com"
+    slack.emails["U1"] = "new@x.com"
+    assert directory.tableau_user("U1") == "old@x.com"
+    time.sleep(0.1)
+    assert directory.tableau_user("U1") == "new@x.com"
+    assert slack.calls == 2